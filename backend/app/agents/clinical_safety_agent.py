@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any
 
 from langchain_core.tools import tool
@@ -9,7 +10,11 @@ from pydantic.config import ConfigDict
 from app.schemas.patient_context import PatientContext
 from app.schemas.enhanced_patient_context import EnhancedPatientContext
 from app.services.rag_service import get_rag_service, NAMESPACE_CLINICAL_SAFETY
-from app.services.neo4j_service import query_kg_relationships, format_kg_context
+from app.services.neo4j_service import query_kg_relationships_bulk, format_kg_context
+
+# Shared by all requests, so a concurrent context search doesn't build and tear
+# down a thread pool per request.
+_RAG_CONTEXT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="clinical-safety-rag")
 
 
 class ClinicalSafetyState(BaseModel):
@@ -72,13 +77,23 @@ def check_clinical_safety(state: ClinicalSafetyState) -> dict:
         "sex": state.patient.sex,
         "ethnicity": state.patient.ethnicity,
     }
-    logger.debug(f"[Clinical Safety Agent] Patient context: age={patient_context['age']}, conditions={patient_context['conditions']}, medications={patient_context['medications']}")
+    logger.debug(
+        "[Clinical Safety Agent] Patient context: age=%s, conditions=%s, medications=%s",
+        patient_context["age"], patient_context["conditions"], patient_context["medications"],
+    )
     
     # Query Neo4j KG for relationships first (GraphRAG)
     try:
-        if any(keyword in text for keyword in ["metformin", "insulin", "glipizide", "jardiance", "ozempic", "lantus"]):
-            logger.info("[Clinical Safety Agent] Querying Neo4j KG for drug interactions...")
-            kg_results = query_kg_relationships(state.user_message, limit=20)
+        kg_terms = [
+            keyword
+            for keyword in ["metformin", "insulin", "glipizide", "jardiance", "ozempic", "lantus"]
+            if keyword in text
+        ]
+        if kg_terms:
+            logger.info("[Clinical Safety Agent] Querying Neo4j KG for drug interactions: %s", kg_terms)
+            # One round-trip for all mentioned drugs instead of one query per term
+            kg_by_term = query_kg_relationships_bulk(kg_terms, limit_per_term=20)
+            kg_results = [item for term in kg_terms for item in kg_by_term.get(term, [])][:25]
             kg_context = format_kg_context(kg_results)
             if kg_results:
                 for item in kg_results[:6]:
@@ -105,7 +120,7 @@ def check_clinical_safety(state: ClinicalSafetyState) -> dict:
                 for med in ["metformin", "insulin", "sulphonylurea", "glipizide", "glyburide"]:
                     if med in text:
                         rag_query_parts.append(med)
-                        logger.info(f"[Clinical Safety Agent] Detected medication keyword: {med}")
+                        logger.info("[Clinical Safety Agent] Detected medication keyword: %s", med)
                         break
             
             # Clinical condition keywords
@@ -151,24 +166,31 @@ def check_clinical_safety(state: ClinicalSafetyState) -> dict:
                         rag_query = f"{rag_query} medications {meds} conditions {conditions}"
                 logger.info(f"[Clinical Safety Agent] No specific keywords found, querying RAG with user message: '{rag_query[:150]}...'")
             
-            rag_results = rag.query_clinical_safety(rag_query, patient_context, top_k=3)
+            # The plain-query context search doesn't depend on the patient-enhanced
+            # results, so it starts alongside them; its context is only built into
+            # the prompt when those results exist.
+            context_future = _RAG_CONTEXT_POOL.submit(
+                rag.get_context_for_llm,
+                rag_query,
+                namespace=NAMESPACE_CLINICAL_SAFETY,
+                top_k=3,
+                include_citations=True,
+            )
+            rag_results = rag.query_clinical_safety(rag_query, patient_context, 3)
             
             if rag_results:
                 logger.info(f"[Clinical Safety Agent] RAG returned {len(rag_results)} results")
-                rag_context = rag.get_context_for_llm(
-                    rag_query,
-                    namespace=NAMESPACE_CLINICAL_SAFETY,
-                    top_k=3,
-                    include_citations=True
-                )
+                rag_context = context_future.result()
                 # Extract citations for system prompt
                 for result in rag_results:
                     source = result.get('metadata', {}).get('source', 'Unknown')
                     if source != 'Unknown':
                         rag_citations.append(source)
                 logger.info(f"[Clinical Safety Agent] RAG context formatted: {len(rag_context)} characters")
-                logger.debug(f"[Clinical Safety Agent] RAG context preview: {rag_context[:200]}...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[Clinical Safety Agent] RAG context preview: %s...", rag_context[:200])
             else:
+                context_future.cancel()
                 logger.warning("[Clinical Safety Agent] RAG query returned no results")
         except Exception as e:
             logger.error(f"[Clinical Safety Agent] RAG query failed: {e}", exc_info=True)
@@ -131,7 +131,10 @@ def analyze_food_image(state: CulturalDietitianState) -> dict:
                         rag_nutritional_data = candidate
                         logger.info(f"[Cultural Dietitian Agent] RAG match confirmed: '{analysis.meal_name}' ~ '{rag_dish}' - using RAG nutritional data")
                         metadata = rag_nutritional_data.get('metadata', {})
-                        logger.debug(f"[Cultural Dietitian Agent] RAG data - Carbs: {metadata.get('carbs_g', 'N/A')}g, Calories: {metadata.get('calories_kcal', 'N/A')}kcal, Source: {metadata.get('source', 'Unknown')}")
+                        logger.debug(
+                            "[Cultural Dietitian Agent] RAG data - Carbs: %sg, Calories: %skcal, Source: %s",
+                            metadata.get('carbs_g', 'N/A'), metadata.get('calories_kcal', 'N/A'), metadata.get('source', 'Unknown'),
+                        )
                         rag_context = rag.get_context_for_llm(
                             analysis.meal_name,
                             namespace=NAMESPACE_CULTURAL_DIET,
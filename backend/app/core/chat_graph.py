@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import logging
-import re
 from pathlib import Path
 from typing import Any
 
@@ -41,6 +40,7 @@ from app.core.timezone_utils import (
 )
 from app.core.system_prompt_builder import build_system_prompt
 from app.core.context_summarizer import summarize_enhanced_context
+from app.core.constants import RAG_SOURCE_RE
 
 logger = logging.getLogger(__name__)
 
@@ -523,7 +523,7 @@ def _route_and_process(input_data: dict[str, Any]) -> dict[str, Any]:
     logger.info("_route_and_process returning output: %s", output[:200])  # Log first 200 chars
     rag_sources = []
     if rag_context:
-        rag_sources = re.findall(r"Source:\s*([^\n|]+)", rag_context)
+        rag_sources = RAG_SOURCE_RE.findall(rag_context)
         rag_sources = list(dict.fromkeys([s.strip() for s in rag_sources if s.strip()]))
 
     return {
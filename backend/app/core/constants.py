@@ -1,6 +1,8 @@
 """Application-wide constants."""
 from __future__ import annotations
 
+import re
+
 # Timezone
 SINGAPORE_TIMEZONE = "Asia/Singapore"
 
@@ -14,6 +16,12 @@ MAX_MEDICATION_LOG_LIMIT = 10
 UTC_OFFSET_SUFFIX = "+00:00"
 UTC_Z_SUFFIX = "Z"
 
+# RAG context source headers: RAGService._format_context writes
+# "Source: <name> | Tags: ..." lines, and the prompt builder and chat logging
+# read the names back with RAG_SOURCE_RE (the name stops at " | Tags").
+RAG_SOURCE_PREFIX = "Source: "
+RAG_SOURCE_RE = re.compile(r"Source:\s*([^\n|]+)")
+
 # Medication detection keywords and phrases
 MEDICATION_PHRASES = [
     "have i taken my medication", "have i taken my med", "have i taken medication",
@@ -0,0 +1,96 @@
+"""Image resizing for meal uploads.
+
+Kept apart from app.services (whose package __init__ loads the RAG stack) so
+the resize worker processes only import Pillow/pyvips.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+
+from PIL import ExifTags, Image, ImageOps
+
+try:  # Optional: libvips-backed resizing (see requirements.txt)
+    import pyvips
+except (ImportError, OSError):  # OSError: pyvips installed but libvips missing
+    pyvips = None
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_WIDTH = 1024  # Resize images to max 1024px width for efficiency
+
+
+def _resize_image_vips(image_bytes: bytes, max_width: int) -> bytes:
+    """libvips implementation of resize_image (shrink-on-load, SIMD resampling)."""
+    # size="down" never upscales; the huge height bound means only width constrains.
+    img = pyvips.Image.thumbnail_buffer(image_bytes, max_width, height=10_000_000, size="down")
+    if img.hasalpha():
+        img = img.flatten(background=[255, 255, 255])
+    return img.jpegsave_buffer(Q=85, optimize_coding=True, strip=True)
+
+
+def resize_image(image_bytes: bytes, max_width: int = MAX_IMAGE_WIDTH) -> bytes:
+    """Resize image to max width while maintaining aspect ratio.
+
+    Uses libvips when pyvips is installed, otherwise Pillow.
+
+    Args:
+        image_bytes: Original image bytes
+        max_width: Maximum width in pixels
+
+    Returns:
+        Resized image bytes in JPEG format
+    """
+    if pyvips is not None:
+        try:
+            return _resize_image_vips(image_bytes, max_width)
+        except Exception as exc:
+            logger.warning(f"libvips resize failed, falling back to Pillow: {exc}")
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        orig_width, orig_height = img.size
+
+        # Phone photos are often stored sideways with an EXIF orientation tag;
+        # the tag is dropped on save, so apply it to the pixels.
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+        transposed = orientation in (5, 6, 7, 8)  # width and height swap
+        width, height = (orig_height, orig_width) if transposed else (orig_width, orig_height)
+
+        # For JPEGs, let the decoder downscale by 1/2, 1/4 or 1/8 while decoding
+        # (no-op for other formats); much cheaper than decoding full size.
+        if width > max_width:
+            target = (max_width, max_width * height // width)
+            img.draft("RGB", target[::-1] if transposed else target)
+        if orientation != 1:
+            img = ImageOps.exif_transpose(img)
+
+        # Palette images can't be resampled with LANCZOS
+        if img.mode == "P":
+            img = img.convert("RGBA")
+
+        # Resize if width exceeds max_width. Done before flattening transparency
+        # so the white background is allocated at the target size, not full size.
+        if img.width > max_width:
+            new_height = int(max_width * img.height / img.width)
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            logger.info(f"Resized image from {width}x{height} to {max_width}x{new_height}")
+
+        # Convert RGBA to RGB if needed (for PNG with transparency)
+        if img.mode in ("RGBA", "LA"):
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+
+        # Convert to JPEG and compress. getvalue() hands over the buffer
+        # without copying it when nothing else references it.
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=85, optimize=True)
+        del img
+
+        return output.getvalue()
+    except Exception as exc:
+        logger.error(f"Error resizing image: {exc}", exc_info=True)
+        # Return original bytes if resize fails
+        return image_bytes
@@ -1,7 +1,6 @@
 """System prompt builder for LLM context."""
 from __future__ import annotations
 
-import re
 from datetime import datetime, timedelta, timezone as tz
 from typing import Optional, List
 
@@ -11,6 +10,7 @@ from app.core.constants import (
     MEDICATION_KEYWORDS_SPECIFIC,
     MEDICATION_PHRASES,
     MEAL_KEYWORDS,
+    RAG_SOURCE_RE,
     WEIGHT_KEYWORDS,
 )
 from app.core.timezone_utils import (
@@ -22,6 +22,12 @@ from app.core.timezone_utils import (
 )
 from app.schemas.enhanced_patient_context import EnhancedPatientContext
 
+# Static citation instructions appended after RAG context; only the source list varies.
+_CITATION_RULE_TEMPLATE = (
+    "\n**Citation rule:** When using information from above, cite the source in the same sentence. "
+    "Use exact names: {source_list}. Example: 'According to [Source], ...'"
+)
+
 
 def build_system_prompt(
     patient_context_str: str,
@@ -157,13 +163,12 @@ def build_system_prompt(
     # No namespace mixing occurs here - rag_context is already namespace-isolated by the agent.
     if rag_context:
         # Single consolidated citation rule (no duplication with rag_service)
-        source_matches = re.findall(r'Source:\s*([^\n|]+)', rag_context)
-        unique_sources = list(set([s.strip() for s in source_matches if s.strip()]))[:5]
+        source_matches = RAG_SOURCE_RE.findall(rag_context)
+        unique_sources = list(dict.fromkeys(s.strip() for s in source_matches if s.strip()))[:5]
         source_list = ", ".join(unique_sources) if unique_sources else "sources above"
         parts.append(
             f"\n📚 {rag_context}\n"
-            "\n**Citation rule:** When using information from above, cite the source in the same sentence. "
-            f"Use exact names: {source_list}. Example: 'According to [Source], ...'"
+            + _CITATION_RULE_TEMPLATE.format(source_list=source_list)
         )
     
     # Add agent output
@@ -73,6 +73,11 @@ async def lifespan(app: FastAPI):
         neo4j_driver = getattr(app.state, "neo4j_driver", None)
         if neo4j_driver is not None:
             neo4j_driver.close()
+        from app.services.neo4j_service import close_neo4j_driver
+        from app.services.supabase_storage_service import shutdown_resize_pool
+
+        close_neo4j_driver()
+        shutdown_resize_pool()
         logger.info("Backend shutdown complete")
 
 
@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import json
 import logging
-import re
 from typing import Any, AsyncIterator
 
 from fastapi import APIRouter, Depends
@@ -14,6 +13,7 @@ from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
 
 from app.core.chat_graph import _route_and_process
+from app.core.constants import RAG_SOURCE_RE
 from app.core.system_prompt_builder import build_system_prompt
 from app.dependencies import extract_user_id, get_current_user
 
@@ -164,8 +164,8 @@ async def _langchain_event_stream(
         if rag_context:
             logger.info("RAG context included in system prompt: %d characters", len(rag_context))
             # Extract source names for verification
-            sources = re.findall(r'Source:\s*([^\n|]+)', rag_context)
-            unique_sources = list(set([s.strip() for s in sources if s.strip()]))
+            sources = RAG_SOURCE_RE.findall(rag_context)
+            unique_sources = list(dict.fromkeys(s.strip() for s in sources if s.strip()))
             logger.info("Source names in RAG context: %s", unique_sources[:5])  # Log first 5
         else:
             logger.info("No RAG context to include in system prompt")
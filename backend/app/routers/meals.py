@@ -15,10 +15,10 @@ from app.dependencies import extract_user_id, get_current_user, get_supabase
 from app.services.image_analysis_service import (
     ImageAnalysisError,
     MealAnalysisResult,
-    analyze_meal_image,
+    analyze_meal_image_async,
     analyze_meal_image_fallback,
 )
-from app.services.supabase_storage_service import ImageUploadError, upload_meal_image
+from app.services.supabase_storage_service import ImageUploadError, upload_meal_image_async
 
 logger = logging.getLogger(__name__)
 
@@ -87,7 +87,7 @@ async def analyze_and_log_meal_image(
 
         # Step 1: Upload image to Supabase Storage
         try:
-            image_url = upload_meal_image(
+            image_url = await upload_meal_image_async(
                 file_content=file_content,
                 filename=file.filename,
                 user_id=user_id,
@@ -99,6 +99,10 @@ async def analyze_and_log_meal_image(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(exc),
             ) from exc
+        finally:
+            # Don't hold the original upload (up to MAX_IMAGE_SIZE_MB) in memory
+            # for the rest of the request; analysis works from the stored URL.
+            del file_content
 
         # Step 2: Analyze image with Vision API
         analysis_result = None
@@ -111,7 +115,7 @@ async def analyze_and_log_meal_image(
                 logger.warning(f"Failed to fetch patient context: {ctx_exc}")
 
             # Analyze meal image
-            analysis_result = analyze_meal_image(
+            analysis_result = await analyze_meal_image_async(
                 image_url=image_url,
                 enhanced_context=enhanced_context,
                 model="gpt-4o-mini",
@@ -1,4 +1,4 @@
 """Services package for business logic."""
-from app.services.rag_service import RAGService, get_rag_service
+from app.services.rag_service import RAGHit, RAGService, get_rag_service
 
-__all__ = ["RAGService", "get_rag_service"]
+__all__ = ["RAGHit", "RAGService", "get_rag_service"]
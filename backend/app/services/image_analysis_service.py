@@ -5,14 +5,18 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import Optional
+from contextlib import aclosing
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from pydantic import BaseModel, Field
 
 from app.schemas.enhanced_patient_context import EnhancedPatientContext
 
+if TYPE_CHECKING:
+    from langchain_core.messages import HumanMessage
+    from langchain_openai import ChatOpenAI
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,6 +40,99 @@ class ImageAnalysisError(Exception):
     pass
 
 
+@lru_cache(maxsize=8)
+def _get_llm(model: str, max_tokens: int, temperature: float) -> ChatOpenAI:
+    """Return a cached Vision-capable LLM client.
+
+    Reusing the client keeps its underlying HTTP connection pool alive across
+    requests instead of rebuilding it (and re-doing TLS handshakes) per call.
+    The import is deferred so workers that never analyze images skip loading
+    langchain_openai (and openai/httpx/tiktoken) at startup.
+    """
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=os.getenv("OPENAI_API_KEY"),
+    )
+
+
+def _build_image_content(text: str, image_url: str) -> list[dict]:
+    """Build the multimodal message content (prompt text + image URL)."""
+    return [
+        {"type": "text", "text": text},
+        {"type": "image_url", "image_url": {"url": image_url, "detail": "auto"}},
+    ]
+
+
+class _JsonObjectTracker:
+    """Track brace depth of streamed text to detect when a JSON object closes.
+
+    Braces inside JSON strings are ignored.
+    """
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume a chunk of text; return True once the first object is closed."""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.started:
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+        return self.started and self.depth == 0
+
+
+def _stream_until_json_complete(llm: ChatOpenAI, messages: list) -> str:
+    """Stream the LLM response and stop once the first JSON object is closed.
+
+    Stopping as soon as the object is complete skips any trailing prose. The
+    stream is closed explicitly so the upstream HTTP response is released
+    right away rather than when the generator is garbage collected.
+    """
+    chunks: list[str] = []
+    tracker = _JsonObjectTracker()
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            chunks.append(text)
+            if tracker.feed(text):
+                break
+    finally:
+        stream.close()
+    return "".join(chunks)
+
+
+async def _astream_until_json_complete(llm: ChatOpenAI, messages: list) -> str:
+    """Async variant of ``_stream_until_json_complete``."""
+    chunks: list[str] = []
+    tracker = _JsonObjectTracker()
+    async with aclosing(llm.astream(messages)) as stream:
+        async for chunk in stream:
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            chunks.append(text)
+            if tracker.feed(text):
+                break
+    return "".join(chunks)
+
+
 def _build_analysis_prompt(enhanced_context: Optional[EnhancedPatientContext] = None) -> str:
     """Build the system prompt for meal image analysis.
 
@@ -120,6 +217,71 @@ Analyze this meal image and provide accurate nutritional information based on wh
     return base_prompt
 
 
+def _prepare_analysis_request(
+    image_url: str,
+    enhanced_context: Optional[EnhancedPatientContext],
+    model: str,
+) -> tuple[ChatOpenAI, HumanMessage]:
+    """Build the LLM client and Vision message for a meal image analysis."""
+    from langchain_core.messages import HumanMessage
+
+    # Get OpenAI API key
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise ImageAnalysisError("OPENAI_API_KEY not found in environment variables")
+
+    # Build prompt
+    system_prompt = _build_analysis_prompt(enhanced_context)
+
+    # Vision-capable LLM (cached). Low temperature for structured JSON
+    # (carbs, calories, etc.) — same plate ~similar estimates
+    llm = _get_llm(model, 800, 0.1)
+
+    # Create message with image. Content is built here from trusted values,
+    # so skip LangChain's pydantic re-validation of the nested structure.
+    message = HumanMessage.model_construct(
+        content=_build_image_content(system_prompt, image_url)
+    )
+    return llm, message
+
+
+def _parse_analysis_response(response_text: str) -> MealAnalysisResult:
+    """Parse the Vision API response into a structured result.
+
+    Falls back to a low-confidence result wrapping the raw text when the
+    response does not contain valid JSON.
+    """
+    logger.info(f"Vision API response: {response_text[:200]}...")
+
+    # Try to parse as JSON
+    try:
+        # Extract JSON from response (in case there's extra text)
+        json_start = response_text.find("{")
+        json_end = response_text.rfind("}") + 1
+        if json_start >= 0 and json_end > json_start:
+            json_str = response_text[json_start:json_end]
+            result_dict = json.loads(json_str)
+            result = MealAnalysisResult(**result_dict)
+        else:
+            raise ValueError("No JSON found in response")
+
+    except (json.JSONDecodeError, ValueError) as exc:
+        logger.warning(f"Failed to parse JSON response: {exc}")
+        # Fallback: create a basic result from the text response
+        result = MealAnalysisResult(
+            meal_name="Meal",
+            description=response_text[:500],  # Use response as description
+            estimated_carbs_g=None,
+            estimated_calories_kcal=None,
+            cuisine_type=None,
+            dietary_notes="Please consult with your dietitian for accurate nutritional information.",
+            confidence_score="low",
+        )
+
+    logger.info(f"Meal analysis complete: {result.meal_name}")
+    return result
+
+
 def analyze_meal_image(
     image_url: str,
     enhanced_context: Optional[EnhancedPatientContext] = None,
@@ -139,69 +301,37 @@ def analyze_meal_image(
         ImageAnalysisError: If analysis fails
     """
     try:
-        # Get OpenAI API key
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise ImageAnalysisError("OPENAI_API_KEY not found in environment variables")
-
-        # Build prompt
-        system_prompt = _build_analysis_prompt(enhanced_context)
-
-        # Initialize Vision-capable LLM
-        llm = ChatOpenAI(
-            model=model,
-            temperature=0.1,  # Structured JSON (carbs, calories, etc.) — same plate ~similar estimates
-            max_tokens=800,
-            api_key=openai_api_key,
-        )
+        llm, message = _prepare_analysis_request(image_url, enhanced_context, model)
+        logger.info(f"Analyzing meal image with {model}: {image_url}")
 
-        # Create message with image
-        message = HumanMessage(
-            content=[
-                {"type": "text", "text": system_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": image_url, "detail": "auto"},
-                },
-            ]
-        )
+        # Call Vision API (streamed, so parsing can start once the JSON closes)
+        response_text = _stream_until_json_complete(llm, [message]).strip()
+        return _parse_analysis_response(response_text)
 
-        logger.info(f"Analyzing meal image with {model}: {image_url}")
+    except Exception as exc:
+        logger.error(f"Error analyzing meal image: {exc}", exc_info=True)
+        raise ImageAnalysisError(f"Failed to analyze meal image: {str(exc)}") from exc
+
+
+async def analyze_meal_image_async(
+    image_url: str,
+    enhanced_context: Optional[EnhancedPatientContext] = None,
+    model: str = "gpt-4o-mini",
+) -> MealAnalysisResult:
+    """Async variant of ``analyze_meal_image`` for use from FastAPI handlers.
+
+    Awaits the Vision API instead of blocking the event loop while waiting
+    on the network.
+
+    Raises:
+        ImageAnalysisError: If analysis fails
+    """
+    try:
+        llm, message = _prepare_analysis_request(image_url, enhanced_context, model)
+        logger.info(f"Analyzing meal image with {model} (async): {image_url}")
 
-        # Call Vision API
-        response = llm.invoke([message])
-
-        # Parse response
-        response_text = response.content.strip()
-        logger.info(f"Vision API response: {response_text[:200]}...")
-
-        # Try to parse as JSON
-        try:
-            # Extract JSON from response (in case there's extra text)
-            json_start = response_text.find("{")
-            json_end = response_text.rfind("}") + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                result_dict = json.loads(json_str)
-                result = MealAnalysisResult(**result_dict)
-            else:
-                raise ValueError("No JSON found in response")
-
-        except (json.JSONDecodeError, ValueError) as exc:
-            logger.warning(f"Failed to parse JSON response: {exc}")
-            # Fallback: create a basic result from the text response
-            result = MealAnalysisResult(
-                meal_name="Meal",
-                description=response_text[:500],  # Use response as description
-                estimated_carbs_g=None,
-                estimated_calories_kcal=None,
-                cuisine_type=None,
-                dietary_notes="Please consult with your dietitian for accurate nutritional information.",
-                confidence_score="low",
-            )
-
-        logger.info(f"Meal analysis complete: {result.meal_name}")
-        return result
+        response_text = (await _astream_until_json_complete(llm, [message])).strip()
+        return _parse_analysis_response(response_text)
 
     except Exception as exc:
         logger.error(f"Error analyzing meal image: {exc}", exc_info=True)
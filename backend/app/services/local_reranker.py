@@ -0,0 +1,79 @@
+"""Optional local cross-encoder reranker (ONNX Runtime) for RAG search results.
+
+Enabled with RAG_LOCAL_RERANK=1. Reranking candidates in-process skips the
+Pinecone server-side rerank step (one network hop per query). Requires the
+optional `onnxruntime`, `transformers` and `huggingface_hub` packages; if they
+are missing, the service falls back to Pinecone's hosted reranker.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import replace
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.rag_service import RAGHit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_RERANK_MODEL = "jinaai/jina-reranker-v2-base-multilingual"
+MAX_RERANK_TOKENS = 512
+
+
+class LocalReranker:
+    """Cross-encoder reranker running an ONNX export of a reranker model."""
+
+    def __init__(self, session, tokenizer) -> None:
+        self._session = session
+        self._tokenizer = tokenizer
+        self._input_names = {i.name for i in session.get_inputs()}
+
+    def rerank(self, query: str, hits: List["RAGHit"], top_n: int) -> List["RAGHit"]:
+        """Score (query, passage) pairs and return the top_n hits by score.
+
+        Scores are passed through a sigmoid so they fall in [0, 1] like
+        Pinecone's hosted reranker scores.
+        """
+        if not hits:
+            return []
+
+        encoded = self._tokenizer(
+            [query] * len(hits),
+            [hit.content for hit in hits],
+            padding=True,
+            truncation=True,
+            max_length=MAX_RERANK_TOKENS,
+            return_tensors="np",
+        )
+        inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._input_names}
+        logits = self._session.run(None, inputs)[0].reshape(-1)
+        scores = 1.0 / (1.0 + np.exp(-logits))
+
+        ranked = sorted(zip(scores.tolist(), hits), key=lambda pair: pair[0], reverse=True)
+        return [replace(hit, score=score, reranked=True) for score, hit in ranked[:top_n]]
+
+
+def load_local_reranker() -> Optional[LocalReranker]:
+    """Load the local reranker, or return None if it can't be loaded."""
+    model_id = os.getenv("RAG_LOCAL_RERANK_MODEL", DEFAULT_LOCAL_RERANK_MODEL)
+    try:
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        logger.warning(f"[RAG] Local rerank requested but dependencies are missing ({e}); using Pinecone reranker")
+        return None
+
+    try:
+        model_path = hf_hub_download(model_id, "onnx/model.onnx")
+        session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+    except Exception as e:
+        logger.error(f"[RAG] Failed to load local reranker '{model_id}': {e}", exc_info=True)
+        return None
+
+    logger.info(f"[RAG] Local reranker loaded: {model_id}")
+    return LocalReranker(session, tokenizer)
@@ -2,31 +2,231 @@ from __future__ import annotations
 
 import logging
 import os
+import re
+import sys
+import time
 from functools import lru_cache
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from neo4j import GraphDatabase
 
 logger = logging.getLogger(__name__)
 
+# LlamaIndex's Neo4jGraphStore stores entities as (:Entity {id}) nodes.
+KG_ENTITY_LABEL = "Entity"
+# Created by the ingest notebook (notebooks/knowledgegraph.ipynb) once the graph is built.
+KG_FULLTEXT_INDEX = "entity_names"
 
-@lru_cache(maxsize=1)
-def get_neo4j_driver():
-    """Return a singleton Neo4j driver if credentials are available."""
+# How long a full-text index status check is reused before SHOW INDEXES runs again.
+KG_INDEX_STATUS_TTL_SECONDS = 60.0
+
+# Word characters never need escaping in Lucene query syntax.
+_TERM_WORD_RE = re.compile(r"\w+")
+
+_KG_PROJECTION = """
+        coalesce(s.name, s.id, "Unknown") AS subject,
+        coalesce(r.rel, r.relationship, r.relation, r.predicate, type(r)) AS relation,
+        coalesce(t.name, t.id, "Unknown") AS object,
+        coalesce(r.source, r.source_doc, r.doc, "") AS source
+"""
+
+# What a term matches: a substring of the subject's or object's name. Both
+# query paths apply it and only look at KG_ENTITY_LABEL nodes (the label the
+# full-text index covers), so results don't depend on the index state.
+_KG_TERM_PREDICATE = """
+    toLower(coalesce(s.name, s.id, "")) CONTAINS item.term
+       OR toLower(coalesce(t.name, t.id, "")) CONTAINS item.term
+"""
+
+# Index-backed lookup: the full-text index finds candidate subjects/objects
+# (see _fulltext_query) instead of scanning every node, then the CONTAINS
+# predicate keeps exactly the matches the fallback would return.
+_KG_FULLTEXT_MATCH = """
+    CALL {
+        WITH item
+        CALL db.index.fulltext.queryNodes($index, item.query) YIELD node AS s
+        MATCH (s)-[r]->(t:Entity)
+        RETURN s, r, t
+        UNION
+        WITH item
+        CALL db.index.fulltext.queryNodes($index, item.query) YIELD node AS t
+        MATCH (s:Entity)-[r]->(t)
+        RETURN s, r, t
+    }
+    WITH item, s, r, t
+    WHERE %s
+""" % _KG_TERM_PREDICATE.strip()
+
+# Fallback when the full-text index is missing or still populating.
+_KG_CONTAINS_MATCH = """
+    MATCH (s:Entity)-[r]->(t:Entity)
+    WHERE %s
+""" % _KG_TERM_PREDICATE.strip()
+
+_KG_CYPHER_TEMPLATE = """
+UNWIND $items AS item
+CALL {
+    WITH item
+    %s
+    RETURN
+        %s
+    ORDER BY coalesce(r.confidence, 0.5) DESC, r.source_doc
+    LIMIT $limit
+}
+RETURN item.term AS term, subject, relation, object, source
+"""
+
+_KG_CONTEXT_HEADER = (
+    "Knowledge Graph Findings (with mandatory citations):\n"
+    "Source: Neo4j Knowledge Graph (drug_interaction_docs)"
+)
+
+_KG_CYPHER_FULLTEXT = _KG_CYPHER_TEMPLATE % (_KG_FULLTEXT_MATCH.strip(), _KG_PROJECTION.strip())
+_KG_CYPHER_CONTAINS = _KG_CYPHER_TEMPLATE % (_KG_CONTAINS_MATCH.strip(), _KG_PROJECTION.strip())
+
+
+def _driver_config() -> tuple[str, tuple[str, str], Dict[str, Any]] | None:
+    """Return (uri, auth, pool settings) for Neo4j, or None if not configured."""
     uri = os.getenv("NEO4J_URI")
     username = os.getenv("NEO4J_USERNAME")
     password = os.getenv("NEO4J_PASSWORD")
-    database = os.getenv("NEO4J_DATABASE", "neo4j")
 
     if not uri or not username or not password:
         logger.warning("[Neo4j] Missing connection settings; skipping Neo4j queries.")
         return None
 
-    driver = GraphDatabase.driver(uri, auth=(username, password))
-    logger.info("[Neo4j] Driver initialized for database '%s'", database)
+    # Pattern analysis fires several KG queries per request; size the pool so
+    # concurrent workers don't stall waiting for a connection.
+    settings = {
+        "max_connection_pool_size": int(os.getenv("NEO4J_POOL_SIZE", "50")),
+        "connection_acquisition_timeout": 10,
+        "keep_alive": True,
+        "max_transaction_retry_time": 5,
+    }
+    return uri, (username, password), settings
+
+
+@lru_cache(maxsize=1)
+def get_neo4j_driver():
+    """Return a singleton Neo4j driver if credentials are available."""
+    config = _driver_config()
+    if config is None:
+        return None
+
+    uri, auth, settings = config
+    driver = GraphDatabase.driver(uri, auth=auth, **settings)
+    logger.info("[Neo4j] Driver initialized for database '%s'", os.getenv("NEO4J_DATABASE", "neo4j"))
     return driver
 
 
+def close_neo4j_driver() -> None:
+    """Close the cached Neo4j driver, if one was created (app shutdown)."""
+    if not get_neo4j_driver.cache_info().currsize:
+        return
+    driver = get_neo4j_driver()
+    get_neo4j_driver.cache_clear()
+    if driver is not None:
+        driver.close()
+
+
+# database -> (checked at, index online)
+_fulltext_index_status: Dict[str, Tuple[float, bool]] = {}
+
+
+def kg_fulltext_index_online(database: str) -> bool:
+    """Return whether the entity full-text index exists and is ONLINE.
+
+    The result (including a failed check) is cached for
+    KG_INDEX_STATUS_TTL_SECONDS, so an index that is created or finishes
+    populating later is picked up without a restart. Until then queries use
+    the CONTAINS scan.
+    """
+    now = time.monotonic()
+    cached = _fulltext_index_status.get(database)
+    if cached is not None and now - cached[0] < KG_INDEX_STATUS_TTL_SECONDS:
+        return cached[1]
+
+    driver = get_neo4j_driver()
+    if driver is None:
+        return False
+
+    try:
+        records, _, _ = driver.execute_query(
+            "SHOW INDEXES YIELD name, state WHERE name = $name RETURN state",
+            name=KG_FULLTEXT_INDEX,
+            database_=database,
+        )
+        online = bool(records) and records[0]["state"] == "ONLINE"
+    except Exception as exc:
+        logger.warning("[Neo4j] Could not check full-text index '%s': %s", KG_FULLTEXT_INDEX, exc)
+        online = False
+
+    if not online:
+        logger.info("[Neo4j] Full-text index '%s' not online; using CONTAINS scan", KG_FULLTEXT_INDEX)
+    _fulltext_index_status[database] = (now, online)
+    return online
+
+
+@lru_cache(maxsize=4096)
+def _normalize_term(term: str) -> str:
+    """Case-fold and strip a search term; cached and interned for repeat terms."""
+    return sys.intern(term.casefold().strip())
+
+
+def _fulltext_query(term: str) -> str:
+    """Build a Lucene query for the nodes whose name could contain `term`.
+
+    Each word of the term must appear inside some indexed token (`*word*`), so
+    substrings and multi-word terms are candidates rather than lost or OR-ed;
+    the CONTAINS predicate then drops candidates that aren't real matches.
+    Returns "" for a term with no word characters.
+    """
+    return " AND ".join(f"*{word}*" for word in _TERM_WORD_RE.findall(term))
+
+
+def _to_triple(row: Any) -> Dict[str, Any]:
+    """Convert a KG query row into a subject/relation/object/source dict."""
+    return {
+        "subject": row.get("subject"),
+        "relation": row.get("relation"),
+        "object": row.get("object"),
+        "source": row.get("source"),
+    }
+
+
+def _kg_query_params(term_norms: List[str], limit: int) -> Dict[str, Any]:
+    """Build query parameters for the KG relationship query."""
+    return {
+        "items": [{"term": t, "query": _fulltext_query(t)} for t in term_norms],
+        "limit": limit,
+        "index": KG_FULLTEXT_INDEX,
+    }
+
+
+def _run_kg_query(
+    term_norms: List[str],
+    limit: int,
+    database: str | None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Run the KG relationship query for normalized terms, grouped by term."""
+    driver = get_neo4j_driver()
+    grouped: Dict[str, List[Dict[str, Any]]] = {t: [] for t in term_norms}
+    if driver is None or not term_norms:
+        return grouped
+
+    database = database or os.getenv("NEO4J_DATABASE", "neo4j")
+    if all(map(_fulltext_query, term_norms)) and kg_fulltext_index_online(database):
+        cypher = _KG_CYPHER_FULLTEXT
+    else:
+        cypher = _KG_CYPHER_CONTAINS
+
+    with driver.session(database=database) as session:
+        rows = session.run(cypher, **_kg_query_params(term_norms, limit))
+        for row in rows:
+            grouped[row.get("term")].append(_to_triple(row))
+    return grouped
+
+
 def query_kg_relationships(
     term: str,
     limit: int = 25,
@@ -37,38 +237,11 @@ def query_kg_relationships(
     This is intentionally generic to support LlamaIndex KG storage. It does not
     assume a custom schema beyond node names and relationship types/properties.
     """
-    driver = get_neo4j_driver()
-    if driver is None:
-        return []
-
-    cypher = """
-    MATCH (s)-[r]->(t)
-    WHERE toLower(coalesce(s.name, s.id, "")) CONTAINS $term
-       OR toLower(coalesce(t.name, t.id, "")) CONTAINS $term
-    RETURN
-        coalesce(s.name, s.id, "Unknown") AS subject,
-        coalesce(r.rel, r.relationship, r.relation, r.predicate, type(r)) AS relation,
-        coalesce(t.name, t.id, "Unknown") AS object,
-        coalesce(r.source, r.source_doc, r.doc, "") AS source
-    LIMIT $limit
-    """
-
-    term_norm = term.lower().strip()
+    term_norm = _normalize_term(term)
     logger.info("[Neo4j] Querying KG for term='%s' (limit=%d)", term_norm, limit)
-    results: List[Dict[str, Any]] = []
 
     try:
-        with driver.session(database=database or os.getenv("NEO4J_DATABASE", "neo4j")) as session:
-            rows = session.run(cypher, term=term_norm, limit=limit)
-            for row in rows:
-                results.append(
-                    {
-                        "subject": row.get("subject"),
-                        "relation": row.get("relation"),
-                        "object": row.get("object"),
-                        "source": row.get("source"),
-                    }
-                )
+        results = _run_kg_query([term_norm], limit, database).get(term_norm, [])
     except Exception as exc:
         logger.error("[Neo4j] KG query failed: %s", exc, exc_info=True)
         return []
@@ -77,23 +250,48 @@ def query_kg_relationships(
     return results
 
 
+def query_kg_relationships_bulk(
+    terms: List[str],
+    limit_per_term: int = 25,
+    database: str | None = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Query Neo4j for KG relationships of several terms in one round-trip.
+
+    Equivalent to calling ``query_kg_relationships`` per term, but the terms are
+    UNWOUND server-side so only a single query is sent. Results are grouped by
+    the normalized term.
+    """
+    term_norms = list(dict.fromkeys(_normalize_term(t) for t in terms if t and t.strip()))
+    if not term_norms:
+        return {}
+
+    logger.info("[Neo4j] Bulk querying KG for %d terms (limit_per_term=%d)", len(term_norms), limit_per_term)
+
+    try:
+        grouped = _run_kg_query(term_norms, limit_per_term, database)
+    except Exception as exc:
+        logger.error("[Neo4j] KG bulk query failed: %s", exc, exc_info=True)
+        return {t: [] for t in term_norms}
+
+    logger.info(
+        "[Neo4j] KG bulk query returned %d relationships",
+        sum(len(v) for v in grouped.values()),
+    )
+    return grouped
+
+
 def format_kg_context(results: List[Dict[str, Any]]) -> str:
-    """Format Neo4j KG results into a citation-friendly context block."""
+    """Format Neo4j KG results into a citation-friendly context block.
+
+    Results are already ordered by relevance and bounded by the query's limit.
+    """
     if not results:
         return ""
 
     lines = [
-        "Knowledge Graph Findings (with mandatory citations):",
-        "Source: Neo4j Knowledge Graph (drug_interaction_docs)",
+        f"- {item['subject']} {item['relation']} {item['object']} (Source detail: {item['source']})"
+        if item.get("source")
+        else f"- {item['subject']} {item['relation']} {item['object']}"
+        for item in results
     ]
-    for item in results[:25]:
-        subject = item.get("subject", "Unknown")
-        relation = item.get("relation", "RELATED_TO")
-        obj = item.get("object", "Unknown")
-        source = item.get("source")
-        if source:
-            lines.append(f"- {subject} {relation} {obj} (Source detail: {source})")
-        else:
-            lines.append(f"- {subject} {relation} {obj}")
-
-    return "\n".join(lines)
+    return "\n".join((_KG_CONTEXT_HEADER, *lines))
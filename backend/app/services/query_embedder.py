@@ -0,0 +1,75 @@
+"""Optional local query embedder for the RAG semantic search cache.
+
+Enabled with RAG_SEMANTIC_CACHE=1. Paraphrased queries ("is metformin safe with
+alcohol" vs "can I drink alcohol on metformin") miss the exact-match cache;
+comparing small local embeddings catches them without a Pinecone round-trip.
+Requires the optional `fastembed` package; if it is missing, the service runs
+with the exact cache only.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_EMBED_MODEL = "BAAI/bge-small-en-v1.5"
+
+# Passage embeddings kept in memory. Retrieved passages come from a small, fixed
+# corpus and the same ones come back across requests, so most are cache hits.
+PASSAGE_CACHE_MAXSIZE = 2048
+
+
+class QueryEmbedder:
+    """Embeds queries into unit-length vectors, so a dot product is cosine similarity."""
+
+    def __init__(self, model) -> None:
+        self._model = model
+        self._passage_cache: LRUCache = LRUCache(maxsize=PASSAGE_CACHE_MAXSIZE)
+        self._passage_cache_lock = threading.Lock()
+
+    def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(next(iter(self._model.query_embed(query))), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_passages(self, passages: List[str]) -> np.ndarray:
+        """Embed passages as rows of a unit-length matrix.
+
+        Only passages missing from the LRU cache are sent to the model.
+        """
+        with self._passage_cache_lock:
+            cached = [self._passage_cache.get(passage) for passage in passages]
+        missing = list(dict.fromkeys(p for p, vector in zip(passages, cached) if vector is None))
+        if missing:
+            vectors = np.asarray(list(self._model.passage_embed(missing)), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            fresh = dict(zip(missing, vectors / np.where(norms == 0, 1, norms)))
+            with self._passage_cache_lock:
+                self._passage_cache.update(fresh)
+            cached = [fresh[p] if vector is None else vector for p, vector in zip(passages, cached)]
+        return np.stack(cached)
+
+
+def load_query_embedder() -> Optional[QueryEmbedder]:
+    """Load the query embedder, or return None if it can't be loaded."""
+    model_id = os.getenv("RAG_SEMANTIC_CACHE_MODEL", DEFAULT_QUERY_EMBED_MODEL)
+    try:
+        from fastembed import TextEmbedding
+    except ImportError as e:
+        logger.warning(f"[RAG] Semantic cache requested but fastembed is missing ({e}); using exact cache only")
+        return None
+
+    try:
+        model = TextEmbedding(model_name=model_id)
+    except Exception as e:
+        logger.error(f"[RAG] Failed to load query embedder '{model_id}': {e}", exc_info=True)
+        return None
+
+    logger.info(f"[RAG] Query embedder loaded: {model_id}")
+    return QueryEmbedder(model)
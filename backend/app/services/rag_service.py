@@ -2,15 +2,29 @@
 from __future__ import annotations
 
 import logging
+import math
 import os
+import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
 from functools import lru_cache
-from typing import Any, Optional, Dict, List
+from itertools import islice
+from typing import Any, Callable, Optional, Dict, Iterable, Iterator, List, Tuple
 
+import numpy as np
+import xxhash
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from pinecone import Pinecone
 from pinecone.exceptions import PineconeException
 
+from app.core.constants import RAG_SOURCE_PREFIX
+from app.services.local_reranker import load_local_reranker
+from app.services.query_embedder import load_query_embedder
+
 # Load environment variables
 load_dotenv()
 
@@ -24,6 +38,348 @@ logger = logging.getLogger(__name__)
 # Note: Lifestyle Analyst Agent does not use RAG; it uses data analysis only.
 NAMESPACE_CLINICAL_SAFETY = "clinical_safety"
 NAMESPACE_CULTURAL_DIET = "dietician_docs"
+_ALLOWED_NAMESPACES = frozenset({NAMESPACE_CLINICAL_SAFETY, NAMESPACE_CULTURAL_DIET})
+
+# In-process cache of formatted search results. Agents repeatedly ask about the
+# same dish/drug, and each miss costs a Pinecone round-trip plus reranking.
+SEARCH_CACHE_MAXSIZE = 4096
+SEARCH_CACHE_TTL_SECONDS = 900
+
+# Query embeddings kept per semantic cache bucket, and buckets kept overall.
+# Buckets include the per-patient query suffix, so they expire with the search
+# cache TTL rather than living as long as the worker.
+SEMANTIC_CACHE_MAX_CANDIDATES = 64
+SEMANTIC_CACHE_MAX_BUCKETS = 256
+
+# Cosine similarity at which a cached query counts as a paraphrase
+# (semantic cache, RAG_SEMANTIC_CACHE=1). Only the query without its suffix is
+# embedded, so a long shared patient context can't push two queries together.
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Medication and condition terms that decide which clinical evidence a query
+# needs. Queries that differ only in one of these embed almost identically, so
+# semantic cache entries are bucketed by the set of terms a query mentions and
+# a paraphrase hit can never swap drugs or conditions.
+_CLINICAL_KEY_TERMS = frozenset({
+    # Medications (drug_interaction_docs corpus, common alternatives, interacting substances)
+    "metformin", "insulin", "glipizide", "gliclazide", "glyburide", "glibenclamide",
+    "glimepiride", "sulphonylurea", "sulfonylurea", "jardiance", "empagliflozin",
+    "dapagliflozin", "canagliflozin", "sglt2", "ozempic", "semaglutide", "liraglutide",
+    "dulaglutide", "glp", "lantus", "glargine", "sitagliptin", "linagliptin", "dpp",
+    "pioglitazone", "acarbose", "aspirin", "warfarin", "statin", "atorvastatin",
+    "simvastatin", "ibuprofen", "nsaid", "steroid", "prednisolone", "alcohol",
+    # Conditions and situations
+    "kidney", "renal", "ckd", "dialysis", "liver", "hepatic", "heart", "cardiac",
+    "stroke", "pregnancy", "pregnant", "breastfeeding", "hypoglycemia", "hypoglycaemia",
+    "hyperglycemia", "ketoacidosis", "dka", "hypertension", "pancreatitis", "elderly",
+    "surgery", "fasting", "ramadan", "exercise", "infection",
+})
+
+# Candidates retrieved per requested result when reranking locally.
+LOCAL_RERANK_OVERSAMPLE = 3
+
+# Similarity above which two retrieved passages count as duplicates in LLM
+# context: cosine with the semantic-cache embedder, word Jaccard otherwise.
+PASSAGE_DEDUP_COSINE = 0.95
+PASSAGE_DEDUP_JACCARD = 0.9
+
+# Upper bound on (query, passage) pairs sent to a reranker per search. Cross-
+# encoder cost is linear in candidates, so large top_k values are capped here.
+RERANK_MAX_CANDIDATES = 20
+
+# Max concurrent upsert_records requests during ingestion.
+UPSERT_MAX_WORKERS = 10
+
+# Pinecone's per-request limit for upsert_records on integrated-embedding indexes.
+UPSERT_MAX_BATCH_SIZE = 96
+
+# Default records per upsert_records call. Fewer, fuller batches amortize the
+# per-request overhead; lower it only if requests hit the payload size limit.
+UPSERT_BATCH_SIZE = min(int(os.getenv("UPSERT_BATCH_SIZE", str(UPSERT_MAX_BATCH_SIZE))), UPSERT_MAX_BATCH_SIZE)
+
+# Sustained upsert_records rate (calls/sec), kept well under Pinecone's
+# per-index write limit. Bursts up to UPSERT_RATE_BURST go through unthrottled.
+UPSERT_RATE_PER_SECOND = 100.0
+UPSERT_RATE_BURST = UPSERT_MAX_WORKERS
+
+# Cap on record text length. Longer text would be truncated server-side by the
+# embedding model anyway; capping here avoids shipping bytes that are ignored.
+MAX_RECORD_TEXT_CHARS = 8000
+
+# Max time to wait for upserted records to become fetchable.
+INDEXING_WAIT_TIMEOUT_SECONDS = 10.0
+
+# IDs per fetch request when checking that upserted records are visible.
+FETCH_MAX_IDS = 100
+
+# HTTP connections kept open to the index. Must cover parallel upserts and
+# searches from concurrent requests, or extra calls wait for a free connection.
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "30"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SOURCE_EXTENSION_RE = re.compile(r"\.(pdf|txt)$")
+
+# Literal lookups (a drug name, a quoted phrase) where the first-stage ranking is
+# already what the caller wants, so the reranker is skipped.
+LITERAL_QUERY_MAX_WORDS = 2
+_LITERAL_QUERY_RES = (
+    re.compile(r"""^\s*(["']).+\1\s*$"""),  # quoted phrase
+)
+
+
+def _normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (lowercase, no punctuation, single spaces)."""
+    return _WHITESPACE_RE.sub(" ", _PUNCTUATION_RE.sub(" ", query.lower())).strip()
+
+
+def _query_words(query: str) -> frozenset:
+    """Return the set of words in a normalized query (order-insensitive)."""
+    return frozenset(_normalize_query(query).split())
+
+
+def _semantic_bucket(bucket: tuple, query: str) -> tuple:
+    """Semantic cache bucket: the search bucket plus the clinical key terms in the query."""
+    return (*bucket, _query_words(query) & _CLINICAL_KEY_TERMS)
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two word sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _search_cache_key(namespace: str, index_type: Optional[str], top_k: int, query: str) -> int:
+    """Build a stable 64-bit cache key for a search.
+
+    xxh3 is deterministic across processes (unlike hash()), so the same key
+    can be used for a shared cache (e.g. hex digest as a Redis key).
+    """
+    raw = f"{namespace}\0{index_type or ''}\0{top_k}\0{_normalize_query(query)}"
+    return xxhash.xxh3_64_intdigest(raw.encode("utf-8"))
+
+
+@lru_cache(maxsize=1024)
+def _clean_source_name(source: str) -> str:
+    """Turn a source filename into a readable citation name (memoized per source)."""
+    if source == "Unknown":
+        return source
+    return _SOURCE_EXTENSION_RE.sub("", source).replace("_", " ")
+
+
+def _hit_tags(tags: Any) -> list:
+    """Return a hit's tags as a list.
+
+    Tags are stored as native lists at ingest; records ingested before that
+    hold a ", "-joined string, which is split here for compatibility.
+    """
+    if isinstance(tags, str):
+        return tags.split(", ") if tags else []
+    return tags or []
+
+
+def _canonicalize_patient_context(patient_context: Dict[str, Any]) -> str:
+    """Render patient context as a canonical query suffix.
+
+    Conditions and medications are sorted so the same patient always produces
+    a byte-identical query (and therefore the same search cache key).
+    """
+    return _canonical_context_string(
+        patient_context.get("age"),
+        tuple(sorted(patient_context.get("conditions") or ())),
+        tuple(sorted(patient_context.get("medications") or ())),
+    )
+
+
+@lru_cache(maxsize=256)
+def _canonical_context_string(age: Any, conditions: tuple, medications: tuple) -> str:
+    """Cached formatter behind _canonicalize_patient_context()."""
+    parts = []
+    if age:
+        parts.append(f"age {age}")
+    if conditions:
+        parts.append(f"conditions {', '.join(conditions)}")
+    if medications:
+        parts.append(f"medications {', '.join(medications)}")
+    return " ".join(parts)
+
+
+def _to_record_field(value: Any) -> Any:
+    """Convert a metadata value into a type Pinecone record fields accept."""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list):
+        # Pinecone supports lists of strings natively; storing them as lists
+        # means search() can return them without re-splitting.
+        return [str(v) for v in value]
+    return str(value)
+
+
+def _is_literal_query(query: str) -> bool:
+    """Return True for short or quoted queries that don't benefit from reranking."""
+    if len(query.split()) <= LITERAL_QUERY_MAX_WORDS:
+        return True
+    return any(pattern.match(query) for pattern in _LITERAL_QUERY_RES)
+
+
+def _dedupe_hits(hits: List[RAGHit], similar: Callable[[int, int], bool]) -> List[RAGHit]:
+    """Cluster near-duplicate hits (union-find) and keep the best-scored of each cluster.
+    
+    Order of the kept hits is preserved.
+    """
+    parent = list(range(len(hits)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(hits)):
+        for j in range(i + 1, len(hits)):
+            if similar(i, j):
+                parent[find(j)] = find(i)
+
+    best: Dict[int, int] = {}
+    for i, hit in enumerate(hits):
+        root = find(i)
+        if root not in best or hit.score > hits[best[root]].score:
+            best[root] = i
+    return [hits[i] for i in sorted(best.values())]
+
+
+def _document_records(documents: Iterable[str], index_type: str) -> Iterator[Dict[str, Any]]:
+    """Yield upsert records for plain-text documents in a single pass.
+    
+    Empty documents and exact duplicates (after stripping) are skipped, and
+    text is capped at MAX_RECORD_TEXT_CHARS. Ids keep the document's position,
+    so they stay stable when earlier documents are skipped.
+    """
+    seen = set()
+    for idx, doc in enumerate(documents):
+        text = doc.strip()[:MAX_RECORD_TEXT_CHARS]
+        if not text:
+            continue
+        digest = xxhash.xxh3_64_intdigest(text.encode("utf-8"))
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield {"_id": f"{index_type}_{idx}", "text": text, "index_type": index_type}
+
+
+def _clinical_safety_suffix(patient_context: Optional[Dict[str, Any]]) -> str:
+    """Build the patient-context suffix for a clinical_safety search ("" if none)."""
+    if not patient_context:
+        return ""
+    context_str = _canonicalize_patient_context(patient_context)
+    if context_str and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[RAG] Enhancing query with patient context: '%s...'", context_str[:150])
+    return context_str
+
+
+# Appended to dish names for dietician_docs searches.
+_CULTURAL_DIET_QUERY_SUFFIX = "nutritional profile calories carbohydrates Singapore"
+
+
+def _with_suffix(query: str, query_suffix: str) -> str:
+    """Return the full search text for a query and its suffix."""
+    return f"{query} {query_suffix}" if query_suffix else query
+
+
+class _TokenBucket:
+    """Thread-safe token bucket: allows bursts, throttles the sustained rate."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self._rate = rate
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping only if the bucket is empty."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self._rate
+            time.sleep(delay)
+
+
+_UPSERT_RATE_LIMITER = _TokenBucket(UPSERT_RATE_PER_SECOND, UPSERT_RATE_BURST)
+
+
+_PC_CLIENTS: Dict[str, Pinecone] = {}
+_PC_LOCK = threading.Lock()
+
+
+def _get_pinecone_client(api_key: str) -> Pinecone:
+    """Return a process-wide Pinecone client, shared by all RAGService instances.
+
+    Sharing one client reuses its HTTP connection pool instead of opening a new
+    one (and new TLS handshakes) per instance.
+    """
+    with _PC_LOCK:
+        client = _PC_CLIENTS.get(api_key)
+        if client is None:
+            client = _PC_CLIENTS[api_key] = Pinecone(api_key=api_key)
+        return client
+
+
+@dataclass(slots=True, frozen=True)
+class RAGHit:
+    """A single formatted search result.
+
+    Supports dict-style access (``hit["content"]``, ``hit.get("metadata", {})``)
+    so callers written against the previous dict results keep working.
+    """
+
+    id: str
+    content: str
+    score: float
+    index_type: str
+    source: str
+    tags: tuple[str, ...] = ()
+    # True if score is a reranker relevance score, False if it is the raw
+    # dense similarity (literal and single-candidate searches skip reranking).
+    reranked: bool = False
+
+    @classmethod
+    def from_search_hit(cls, hit: Any, reranked: bool = False) -> "RAGHit":
+        """Build a RAGHit from a Pinecone search hit."""
+        fields = hit.fields
+        return cls(
+            id=hit["_id"],
+            # Index uses "text" field, but we return as "content" for consistency
+            content=fields.get("text") or fields.get("content", ""),
+            score=hit["_score"],
+            index_type=fields.get("index_type", "unknown"),
+            source=fields.get("source", "unknown"),
+            tags=tuple(_hit_tags(fields.get("tags"))),
+            reranked=reranked,
+        )
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata in the previous dict-result layout."""
+        return {"index_type": self.index_type, "source": self.source, "tags": list(self.tags)}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _RAG_HIT_KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style get() for backwards compatibility."""
+        return getattr(self, key) if key in _RAG_HIT_KEYS else default
+
+
+_RAG_HIT_KEYS = frozenset({"id", "content", "score", "metadata", "index_type", "source", "tags"})
 
 
 class RAGService:
@@ -42,30 +398,174 @@ class RAGService:
             index_name: Name of the Pinecone index. Defaults to environment variable
                        or 'diabetes-medical-knowledge'
         """
+        # (namespace, query key) -> results; the namespace allows per-namespace invalidation
+        self._search_cache: TTLCache = TTLCache(
+            maxsize=SEARCH_CACHE_MAXSIZE, ttl=SEARCH_CACHE_TTL_SECONDS
+        )
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_semantic_hits = 0
+        self._cache_misses = 0
+        # semantic bucket -> {cache_key: unit query embedding}; only used with the semantic cache
+        self._semantic_index: TTLCache = TTLCache(
+            maxsize=SEMANTIC_CACHE_MAX_BUCKETS, ttl=SEARCH_CACHE_TTL_SECONDS
+        )
+        self.query_embedder = load_query_embedder() if os.getenv("RAG_SEMANTIC_CACHE") == "1" else None
+
+        # Candidates retrieved per requested result before server-side reranking.
+        # Pinecone's reranker already scores the candidate pool, so 1 avoids
+        # shipping and reranking twice as many documents. Fractional values
+        # (e.g. 1.5) are allowed.
+        self.rerank_oversample = max(1.0, float(os.getenv("RAG_RERANK_OVERSAMPLE", "1")))
+        # Pinecone-hosted reranker. bge-reranker-v2-m3 is the most accurate of the
+        # hosted options; pinecone-rerank-v0 or cohere-rerank-3.5 trade a little
+        # nDCG for lower latency on latency-sensitive agent turns.
+        self.reranker_model = os.getenv("RAG_RERANKER_MODEL", "bge-reranker-v2-m3")
+        # Minimum reranker score for a hit to be included in LLM context.
+        self.min_rerank_score = float(os.getenv("RAG_MIN_SCORE", "0.3"))
+        # Optional in-process cross-encoder; replaces Pinecone's hosted reranker.
+        self.local_reranker = load_local_reranker() if os.getenv("RAG_LOCAL_RERANK") == "1" else None
+
+        self.index_name = index_name or os.getenv("PINECONE_INDEX", "diabetes-medical-knowledge")
+        # Index handle is resolved on first use (see the index property), so
+        # startup doesn't block on, or fail because of, Pinecone reachability.
+        self._index = None
+        self._index_lock = threading.Lock()
+
         self.api_key = os.getenv("PINECONE_API_KEY")
         if not self.api_key:
             logger.warning("PINECONE_API_KEY not found. RAG operations will be disabled.")
             self.pc = None
-            self.index = None
             return
         
         try:
-            self.pc = Pinecone(api_key=self.api_key)
-            self.index_name = index_name or os.getenv("PINECONE_INDEX", "diabetes-medical-knowledge")
-            self.index = self.pc.Index(self.index_name)
-            logger.info(f"RAG service initialized with index: {self.index_name}")
+            self.pc = _get_pinecone_client(self.api_key)
+            logger.info(f"RAG service initialized for index: {self.index_name}")
         except Exception as e:
             logger.error(f"Failed to initialize Pinecone: {e}")
             self.pc = None
-            self.index = None
+    
+    @property
+    def index(self):
+        """Pinecone index handle, created on first use.
+        
+        Resolving the index host is a network call. If it fails, None is
+        returned and the next access tries again.
+        """
+        if self._index is None and self.pc is not None:
+            with self._index_lock:
+                if self._index is None:
+                    try:
+                        # Records upsert/search only exist on the REST data plane (the
+                        # gRPC client routes them over REST too), so size the REST pool.
+                        self._index = self.pc.Index(self.index_name, pool_threads=PINECONE_POOL_THREADS)
+                        logger.info(f"Connected to Pinecone index: {self.index_name}")
+                    except Exception as e:
+                        logger.error(f"Failed to connect to Pinecone index '{self.index_name}': {e}")
+        return self._index
     
     def is_available(self) -> bool:
-        """Check if RAG service is available (API key configured)."""
-        available = self.index is not None
+        """Check if RAG service is available (API key configured). Makes no network calls."""
+        available = self.pc is not None
         if not available:
             logger.debug("[RAG] Service not available - PINECONE_API_KEY not configured or index not initialized")
         return available
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return search result cache statistics (hits, misses, size, hit rate)."""
+        with self._cache_lock:
+            hits, misses = self._cache_hits, self._cache_misses
+            semantic_hits = self._cache_semantic_hits
+            size = len(self._search_cache)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "semantic_hits": semantic_hits,
+            "misses": misses,
+            "size": size,
+            "maxsize": SEARCH_CACHE_MAXSIZE,
+            "ttl_seconds": SEARCH_CACHE_TTL_SECONDS,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def _cache_lookup(
+        self,
+        cache_key: Tuple[str, int],
+        bucket: tuple,
+        query: str,
+    ) -> Tuple[Optional[list[RAGHit]], Optional[np.ndarray]]:
+        """Return cached results for an exact (normalized) or paraphrased query.
+        
+        Also returns the query embedding when the semantic cache computed one,
+        so _cache_store() can reuse it. Any semantic cache failure counts as a
+        plain miss, so search() still degrades the way it always has.
+        """
+        with self._cache_lock:
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                self._cache_hits += 1
+                return cached, None
+
+            if self.query_embedder is None:
+                self._cache_misses += 1
+                return None, None
+
+        try:
+            # Embed outside the lock; it is the slow part of a semantic lookup.
+            embedding = self.query_embedder.embed(query)
+        except Exception as e:
+            logger.warning(f"[RAG] Semantic cache lookup failed, treating as a miss: {e}")
+            with self._cache_lock:
+                self._cache_misses += 1
+            return None, None
+
+        with self._cache_lock:
+            candidates = self._semantic_index.get(_semantic_bucket(bucket, query))
+            if candidates:
+                for key in [key for key in candidates if key not in self._search_cache]:
+                    del candidates[key]  # expired from the TTL cache
+            if candidates:
+                keys = list(candidates)
+                similarities = np.stack(list(candidates.values())) @ embedding
+                best = int(np.argmax(similarities))
+                cached = self._search_cache.get(keys[best])
+                if cached is not None and similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+                    self._cache_hits += 1
+                    self._cache_semantic_hits += 1
+                    return cached, embedding
+
+            self._cache_misses += 1
+            return None, embedding
+
+    def _cache_store(
+        self,
+        cache_key: Tuple[str, int],
+        bucket: tuple,
+        query: str,
+        results: list[RAGHit],
+        embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        """Store search results in the exact and semantic caches."""
+        with self._cache_lock:
+            self._search_cache[cache_key] = results
+            if embedding is not None:
+                semantic_bucket = _semantic_bucket(bucket, query)
+                vectors = self._semantic_index.get(semantic_bucket) or OrderedDict()
+                vectors[cache_key] = embedding
+                vectors.move_to_end(cache_key)
+                while len(vectors) > SEMANTIC_CACHE_MAX_CANDIDATES:
+                    vectors.popitem(last=False)
+                # Re-assign so the bucket's TTL restarts with its newest entry
+                self._semantic_index[semantic_bucket] = vectors
+
+    def _invalidate_cache(self, namespace: str) -> None:
+        """Drop cached search results for a namespace, e.g. after its records changed."""
+        with self._cache_lock:
+            for key in [key for key in self._search_cache if key[0] == namespace]:
+                self._search_cache.pop(key, None)
+            for bucket in [bucket for bucket in self._semantic_index if bucket[0] == namespace]:
+                del self._semantic_index[bucket]
+
     def ingest_documents(
         self,
         documents: list[str],
@@ -85,29 +585,21 @@ class RAGService:
         
         namespace = namespace or index_type
         
-        # Prepare records for upsert
-        records = []
-        for idx, doc in enumerate(documents):
-            record = {
-                "_id": f"{index_type}_{idx}",
-                "text": doc.strip(),
-                "index_type": index_type,
-            }
-            records.append(record)
-        
         try:
-            # Upsert in batches (max 96 records per batch for text)
-            batch_size = 96
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
-                self.index.upsert_records(namespace, batch)
-                logger.info(f"Upserted batch {i//batch_size + 1} ({len(batch)} records) to namespace '{namespace}'")
-                time.sleep(0.1)  # Rate limiting
+            upserted_ids = self._upsert_batches(
+                namespace,
+                _document_records(documents, index_type),
+                batch_size=UPSERT_BATCH_SIZE,
+            )
             
             # Wait for indexing to complete
-            logger.info(f"Waiting 10 seconds for vectors to be indexed...")
-            time.sleep(10)
-            logger.info(f"Successfully ingested {len(records)} documents into namespace '{namespace}'")
+            self._wait_for_indexing(namespace, upserted_ids)
+            ingested = len(upserted_ids)
+            skipped = len(documents) - ingested
+            logger.info(
+                f"Successfully ingested {ingested} documents into namespace '{namespace}'"
+                + (f" ({skipped} empty or duplicate skipped)" if skipped else "")
+            )
             
         except PineconeException as e:
             logger.error(f"Pinecone error during ingestion: {e}", exc_info=True)
@@ -115,6 +607,203 @@ class RAGService:
         except Exception as e:
             logger.error(f"Unexpected error during ingestion: {e}", exc_info=True)
             raise
+        finally:
+            # Cached results predate the new records (even a failed ingest may
+            # have written some batches); done after indexing so searches in
+            # the meantime can't re-cache stale results.
+            self._invalidate_cache(namespace)
+    
+    def _upsert_batches(
+        self,
+        namespace: str,
+        records: Iterable[Dict[str, Any]],
+        batch_size: int,
+    ) -> List[str]:
+        """Upsert records in batches, with up to UPSERT_MAX_WORKERS requests in flight.
+        
+        Batches are pulled from `records` only as workers free up, so a lazy
+        iterable is never materialized in full. Calls share a module-level token
+        bucket, so bursts go out at full speed and only the sustained rate is
+        throttled (the Pinecone SDK also backs off on 429s). All batches are
+        attempted; if any fail, the first error is re-raised after the rest
+        have completed.
+        
+        Returns:
+            IDs of the upserted records
+        """
+        batch_size = min(batch_size, UPSERT_MAX_BATCH_SIZE)
+        records = iter(records)
+        batches = iter(lambda: list(islice(records, batch_size)), [])
+        
+        errors: List[Exception] = []
+        batch_count = 0
+        upserted_ids: List[str] = []
+        
+        def collect(done) -> None:
+            for future in done:
+                batch_num, batch_ids = pending.pop(future)
+                try:
+                    future.result()
+                    upserted_ids.extend(batch_ids)
+                    logger.info("Upserted batch %s (%s records) to namespace '%s'", batch_num, len(batch_ids), namespace)
+                except PineconeException as e:
+                    logger.error("Pinecone error upserting batch %s to namespace '%s': %s", batch_num, namespace, e)
+                    errors.append(e)
+                except Exception as e:
+                    logger.error("Error upserting batch %s to namespace '%s': %s", batch_num, namespace, e, exc_info=True)
+                    errors.append(e)
+        
+        pending: Dict[Future, tuple] = {}
+        with ThreadPoolExecutor(max_workers=UPSERT_MAX_WORKERS) as executor:
+            for batch_count, batch in enumerate(batches, 1):
+                if len(pending) >= UPSERT_MAX_WORKERS:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                future = executor.submit(self._rate_limited_upsert, namespace, batch)
+                pending[future] = (batch_count, [record["_id"] for record in batch])
+            collect(list(as_completed(pending)))
+        
+        if errors:
+            logger.error(f"{len(errors)}/{batch_count} batches failed for namespace '{namespace}'")
+            raise errors[0]
+        return upserted_ids
+    
+    def _rate_limited_upsert(self, namespace: str, batch: List[Dict[str, Any]]) -> None:
+        """Upsert one batch once the shared rate limiter allows it."""
+        _UPSERT_RATE_LIMITER.acquire()
+        self.index.upsert_records(namespace, batch)
+    
+    def _missing_ids(self, namespace: str, ids: List[str]) -> List[str]:
+        """Return the IDs that can't be fetched from the namespace yet."""
+        missing: List[str] = []
+        for start in range(0, len(ids), FETCH_MAX_IDS):
+            chunk = ids[start:start + FETCH_MAX_IDS]
+            try:
+                found = self.index.fetch(ids=chunk, namespace=namespace).vectors
+            except Exception as e:
+                logger.warning("Could not fetch records from namespace '%s': %s", namespace, e)
+                found = {}
+            missing.extend(record_id for record_id in chunk if record_id not in found)
+        return missing
+    
+    def _wait_for_indexing(
+        self,
+        namespace: str,
+        ids: List[str],
+        timeout: float = INDEXING_WAIT_TIMEOUT_SECONDS,
+    ) -> None:
+        """Poll until every upserted ID can be fetched, or timeout.
+        
+        Checking IDs rather than the namespace's vector count means overwriting
+        existing records (re-ingesting with the same IDs) doesn't wait for a
+        count that never grows. Only IDs still missing are re-checked, with
+        exponential backoff (0.25s, 0.5s, 1s, ...).
+        """
+        logger.info(f"Waiting up to {timeout:.0f} seconds for vectors to be indexed...")
+        deadline = time.monotonic() + timeout
+        delay = 0.25
+        missing = list(ids)
+        while True:
+            missing = self._missing_ids(namespace, missing)
+            if not missing:
+                logger.info("Namespace '%s' indexed: %s records visible", namespace, len(ids))
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(
+                    "Timed out waiting for namespace '%s' to be indexed (%s/%s records visible)",
+                    namespace, len(ids) - len(missing), len(ids),
+                )
+                return
+            time.sleep(min(delay, remaining))
+            delay *= 2
+    
+    def _check_search_namespace(self, namespace: Optional[str]) -> bool:
+        """Return True if a search in `namespace` is allowed and Pinecone is configured."""
+        if not self.is_available():
+            logger.warning("[RAG] Search skipped - Pinecone not configured")
+            return False
+        
+        # Validate namespace is one of the allowed namespaces
+        if namespace and namespace not in _ALLOWED_NAMESPACES:
+            logger.error(f"[RAG] Invalid namespace '{namespace}' - must be one of {sorted(_ALLOWED_NAMESPACES)}")
+            return False
+        
+        # Require namespace parameter for strict isolation
+        if not namespace:
+            logger.error("[RAG] search() called without namespace - NAMESPACE ISOLATION VIOLATION!")
+            logger.error("[RAG] Use namespace-specific query methods: query_clinical_safety(), query_cultural_diet()")
+            return False
+        return True
+    
+    def _build_search_request(
+        self,
+        query: str,
+        index_type: Optional[str],
+        top_k: int,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], bool]:
+        """Build the Pinecone query and rerank config for a search.
+        
+        Returns:
+            (query dict, rerank config or None, whether the query is literal)
+        """
+        # Build query with optional metadata filter. Literal lookups skip
+        # reranking, so they only need top_k candidates.
+        literal = _is_literal_query(query)
+        if literal:
+            candidates = top_k
+        else:
+            oversample = LOCAL_RERANK_OVERSAMPLE if self.local_reranker is not None else self.rerank_oversample
+            candidates = max(top_k, min(math.ceil(top_k * oversample), RERANK_MAX_CANDIDATES))
+        query_dict = {
+            "top_k": candidates,  # Candidates for reranking
+            "inputs": {
+                "text": query
+            }
+        }
+        
+        # Add metadata filter if index_type specified
+        if index_type:
+            query_dict["filter"] = {"index_type": {"$eq": index_type}}
+            logger.debug("[RAG] Added metadata filter: index_type=%s", index_type)
+        
+        # Perform search with reranking for better results. Reranking a single
+        # candidate (e.g. cultural diet lookups with top_k=1) can't change the
+        # outcome, and literal lookups are already ranked by the dense match,
+        # so skip the reranker round-trip in those cases.
+        rerank = None
+        if candidates > 1 and not literal and self.local_reranker is None:
+            rerank = {
+                "model": self.reranker_model,
+                "top_n": top_k,
+                "rank_fields": ["text"]  # Index uses "text" field
+            }
+        return query_dict, rerank, literal
+    
+    def _format_search_results(
+        self,
+        query: str,
+        results: Any,
+        top_k: int,
+        literal: bool,
+        namespace: str,
+        reranked: bool,
+    ) -> list[RAGHit]:
+        """Turn a Pinecone search response into RAGHits (reranking locally if enabled).
+        
+        `reranked` says whether Pinecone already reranked the hits.
+        """
+        formatted_results = [RAGHit.from_search_hit(hit, reranked) for hit in results.result.hits]
+        
+        if self.local_reranker is not None and not literal:
+            formatted_results = self.local_reranker.rerank(query, formatted_results, top_k)
+        
+        logger.info("[RAG] Search completed: %s results from namespace '%s'", len(formatted_results), namespace)
+        if formatted_results:
+            logger.debug(
+                "[RAG] Top result - Score: %.4f, Source: %s",
+                formatted_results[0].score, formatted_results[0].source,
+            )
+        return formatted_results
     
     def search(
         self,
@@ -122,7 +811,8 @@ class RAGService:
         index_type: Optional[str] = None,
         top_k: int = 5,
         namespace: Optional[str] = None,
-    ) -> list[dict[str, Any]]:
+        query_suffix: str = "",
+    ) -> list[RAGHit]:
         """Search for relevant documents using semantic search.
         
         WARNING: This is an internal method. Agents should use namespace-specific methods:
@@ -134,77 +824,45 @@ class RAGService:
             index_type: Filter by knowledge type (e.g., 'drug', 'food', 'clinical')
             top_k: Number of results to return
             namespace: REQUIRED - Specific namespace to search (clinical_safety, dietician_docs)
+            query_suffix: Fixed text appended to the query for retrieval (e.g. the
+                canonical patient context). Cached results are only shared between
+                searches with the same suffix, and the semantic cache compares the
+                query without it.
             
         Returns:
             List of search results with content, score, and metadata
         """
-        if not self.is_available():
-            logger.warning("[RAG] Search skipped - Pinecone not configured")
+        if not self._check_search_namespace(namespace):
             return []
         
-        # Validate namespace is one of the allowed namespaces
-        allowed_namespaces = [NAMESPACE_CLINICAL_SAFETY, NAMESPACE_CULTURAL_DIET]
-        if namespace and namespace not in allowed_namespaces:
-            logger.error(f"[RAG] Invalid namespace '{namespace}' - must be one of {allowed_namespaces}")
-            return []
-        
-        # Require namespace parameter for strict isolation
-        if not namespace:
-            logger.error("[RAG] search() called without namespace - NAMESPACE ISOLATION VIOLATION!")
-            logger.error("[RAG] Use namespace-specific query methods: query_clinical_safety(), query_cultural_diet()")
-            return []
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[RAG] Search called: namespace='%s', query='%s...', top_k=%s", namespace, query[:80], top_k)
         
-        logger.info(f"[RAG] Search called: namespace='{namespace}' (ISOLATED), query='{query[:80]}...', top_k={top_k}")
+        full_query = _with_suffix(query, query_suffix)
+        cache_key = (namespace, _search_cache_key(namespace, index_type, top_k, full_query))
+        bucket = (namespace, index_type, top_k, query_suffix)
+        cached, query_embedding = self._cache_lookup(cache_key, bucket, query)
+        if cached is not None:
+            logger.debug("[RAG] Search cache hit: %s results from namespace '%s'", len(cached), namespace)
+            return list(cached)
         
         try:
-            # Build query with optional metadata filter
-            query_dict = {
-                "top_k": top_k * 2,  # Get more candidates for reranking
-                "inputs": {
-                    "text": query
-                }
-            }
-            
-            # Add metadata filter if index_type specified
-            if index_type:
-                query_dict["filter"] = {"index_type": {"$eq": index_type}}
-                logger.debug(f"[RAG] Added metadata filter: index_type={index_type}")
-            
-            # Perform search with reranking for better results
-            logger.debug(f"[RAG] Executing Pinecone search in namespace '{namespace}'...")
-            results = self.index.search(
+            query_dict, rerank, literal = self._build_search_request(full_query, index_type, top_k)
+            logger.debug("[RAG] Executing Pinecone search in namespace '%s'...", namespace)
+            index = self.index
+            if index is None:
+                return []
+            results = index.search(
                 namespace=namespace,
                 query=query_dict,
-                rerank={
-                    "model": "bge-reranker-v2-m3",
-                    "top_n": top_k,
-                    "rank_fields": ["text"]  # Index uses "text" field
-                }
+                rerank=rerank,
             )
             
-            # Format results
-            formatted_results = []
-            for hit in results.result.hits:
-                # Index uses "text" field, but we return as "content" for consistency
-                content = hit.fields.get("text") or hit.fields.get("content", "")
-                formatted_results.append({
-                    "id": hit["_id"],
-                    "content": content,
-                    "score": hit["_score"],
-                    "metadata": {
-                        "index_type": hit.fields.get("index_type", "unknown"),
-                        "source": hit.fields.get("source", "unknown"),
-                        "tags": hit.fields.get("tags", "").split(", ") if isinstance(hit.fields.get("tags"), str) else hit.fields.get("tags", []),
-                    }
-                })
-            
-            logger.info(f"[RAG] Search completed: {len(formatted_results)} results from namespace '{namespace}' for query: '{query[:50]}...'")
-            if formatted_results:
-                top_score = formatted_results[0].get("score", 0)
-                top_source = formatted_results[0].get("metadata", {}).get("source", "Unknown")
-                logger.debug(f"[RAG] Top result - Score: {top_score:.4f}, Source: {top_source}")
-            
-            return formatted_results
+            formatted_results = self._format_search_results(
+                full_query, results, top_k, literal, namespace, rerank is not None
+            )
+            self._cache_store(cache_key, bucket, query, formatted_results, query_embedding)
+            return list(formatted_results)
             
         except PineconeException as e:
             logger.error(f"Pinecone error during search: {e}", exc_info=True)
@@ -236,53 +894,83 @@ class RAGService:
             Formatted context string with citations from the specified namespace only.
             Citations are ALWAYS included when RAG is used - they are mandatory.
         """
+        if not self._check_context_namespace(namespace):
+            return ""
+        
+        logger.debug("[RAG] get_context_for_llm called: namespace='%s', top_k=%s", namespace, top_k)
+        
+        # Search ONLY the specified namespace
+        results = self.search(query, namespace=namespace, top_k=top_k)
+        return self._format_context(query, namespace, results)
+    
+    def _check_context_namespace(self, namespace: Optional[str]) -> bool:
+        """Return True if LLM context may be built from `namespace`."""
         if not self.is_available():
             logger.debug("[RAG] get_context_for_llm skipped - RAG service not available")
-            return ""
+            return False
         
         # STRICT NAMESPACE ISOLATION: Require namespace parameter
         if not namespace:
             logger.error("[RAG] get_context_for_llm called without namespace - NAMESPACE ISOLATION VIOLATION!")
             logger.error("[RAG] Each agent must specify their namespace. No cross-namespace queries allowed.")
-            return ""
+            return False
         
         # Validate namespace is one of the allowed namespaces
-        allowed_namespaces = [NAMESPACE_CLINICAL_SAFETY, NAMESPACE_CULTURAL_DIET]
-        if namespace not in allowed_namespaces:
-            logger.error(f"[RAG] Invalid namespace '{namespace}' - must be one of {allowed_namespaces}")
-            return ""
-        
-        logger.info(f"[RAG] get_context_for_llm called: query='{query[:80]}...', namespace='{namespace}' (ISOLATED), top_k={top_k}")
-        logger.info(f"[RAG] NAMESPACE ISOLATION: Querying ONLY '{namespace}' namespace")
-        
-        # Search ONLY the specified namespace
-        results = self.search(query, namespace=namespace, top_k=top_k)
-        logger.info(f"[RAG] Searched namespace '{namespace}' ONLY, found {len(results)} results")
-        
-        # Format as context string
+        if namespace not in _ALLOWED_NAMESPACES:
+            logger.error(f"[RAG] Invalid namespace '{namespace}' - must be one of {sorted(_ALLOWED_NAMESPACES)}")
+            return False
+        return True
+    
+    def _format_context(self, query: str, namespace: str, results: List[RAGHit]) -> str:
+        """Filter, de-duplicate and format search results as LLM context."""
         if not results:
             logger.warning(f"[RAG] No results found in namespace '{namespace}' for query: '{query[:80]}...'")
             return ""
         
+        # Drop low-relevance hits; irrelevant context invites made-up citations
+        # and costs prompt tokens. If nothing clears the floor, let the LLM answer
+        # without RAG context. The floor is calibrated for reranker scores; dense
+        # similarities (literal and single-candidate lookups) sit on a different
+        # scale and are kept.
+        relevant = [r for r in results if not r.reranked or r.score >= self.min_rerank_score]
+        if not relevant:
+            logger.info(
+                f"[RAG] All {len(results)} results below min rerank score {self.min_rerank_score} "
+                f"in namespace '{namespace}' - skipping RAG context"
+            )
+            return ""
+        results = self._dedupe_passages(relevant)
+        
         # Format RAG content with source headers. Citation rules are added once in system_prompt_builder.
         context_parts = ["Evidence-Based Knowledge:"]
         for idx, result in enumerate(results, 1):
-            content = result['content']
-            source = result.get('metadata', {}).get('source', 'Unknown')
-            tags = result.get('metadata', {}).get('tags', [])
-            clean_source = (
-                source.replace('_', ' ').replace('.pdf', '').replace('.txt', '')
-                if source != 'Unknown' else 'Unknown'
-            )
-            header = f"Source: {clean_source}"
+            content = result.content
+            source = result.source
+            tags = result.tags
+            header = f"{RAG_SOURCE_PREFIX}{_clean_source_name(source)}"
             if tags:
                 header += f" | Tags: {', '.join(tags[:3])}"
             context_parts.append(f"[{idx}] {header}\nContent: {content}")
         
         context_str = "\n\n".join(context_parts)
-        logger.info(f"[RAG] Formatted context: {len(context_str)} chars from {len(results)} results")
+        logger.debug("[RAG] Formatted context: %s chars from %s results", len(context_str), len(results))
         return context_str
     
+    def _dedupe_passages(self, results: List[RAGHit]) -> List[RAGHit]:
+        """Drop paraphrased/duplicated passages so they don't fill the LLM context."""
+        if len(results) < 2:
+            return results
+        if self.query_embedder is not None:
+            vectors = self.query_embedder.embed_passages([r.content for r in results])
+            similarities = vectors @ vectors.T
+            deduped = _dedupe_hits(results, lambda i, j: similarities[i, j] >= PASSAGE_DEDUP_COSINE)
+        else:
+            words = [_query_words(r.content) for r in results]
+            deduped = _dedupe_hits(results, lambda i, j: _jaccard(words[i], words[j]) >= PASSAGE_DEDUP_JACCARD)
+        if len(deduped) < len(results):
+            logger.debug("[RAG] Dropped %s near-duplicate passages", len(results) - len(deduped))
+        return deduped
+    
     # Namespace-specific query methods for agent isolation
     
     def query_clinical_safety(
@@ -290,7 +978,7 @@ class RAGService:
         query: str,
         patient_context: Optional[Dict[str, Any]] = None,
         top_k: int = 3,
-    ) -> List[Dict[str, Any]]:
+    ) -> List[RAGHit]:
         """Query clinical safety namespace for drug interactions, contraindications, etc.
         
         IMPORTANT: This method ONLY queries the 'clinical_safety' namespace.
@@ -308,27 +996,17 @@ class RAGService:
             logger.warning("[RAG] Clinical Safety query skipped - RAG service not available")
             return []
         
-        logger.info(f"[RAG] Clinical Safety query initiated: '{query[:100]}...' (top_k={top_k})")
-        logger.info(f"[RAG] NAMESPACE ISOLATION: Querying ONLY '{NAMESPACE_CLINICAL_SAFETY}' namespace")
-        
-        # Enhance query with patient context if provided
-        enhanced_query = query
-        if patient_context:
-            context_parts = [query]
-            if patient_context.get('age'):
-                context_parts.append(f"age {patient_context['age']}")
-            if patient_context.get('conditions'):
-                context_parts.append(f"conditions {', '.join(patient_context['conditions'])}")
-            if patient_context.get('medications'):
-                context_parts.append(f"medications {', '.join(patient_context['medications'])}")
-            enhanced_query = " ".join(context_parts)
-            logger.debug(f"[RAG] Enhanced query with patient context: '{enhanced_query[:150]}...'")
+        logger.debug("[RAG] Clinical Safety query in namespace '%s' (top_k=%s)", NAMESPACE_CLINICAL_SAFETY, top_k)
         
         # STRICT NAMESPACE ISOLATION: Only query clinical_safety namespace
-        results = self.search(enhanced_query, namespace=NAMESPACE_CLINICAL_SAFETY, top_k=top_k)
-        logger.info(f"[RAG] Clinical Safety query returned {len(results)} results from namespace '{NAMESPACE_CLINICAL_SAFETY}' ONLY")
+        results = self.search(
+            query,
+            namespace=NAMESPACE_CLINICAL_SAFETY,
+            top_k=top_k,
+            query_suffix=_clinical_safety_suffix(patient_context),
+        )
         if results:
-            logger.debug(f"[RAG] Top result source: {results[0].get('metadata', {}).get('source', 'Unknown')}")
+            logger.debug("[RAG] Top result source: %s", results[0].source)
         
         return results
     
@@ -336,7 +1014,7 @@ class RAGService:
         self,
         dish_name: str,
         top_k: int = 1,
-    ) -> List[Dict[str, Any]]:
+    ) -> List[RAGHit]:
         """Query cultural diet namespace for Singaporean food nutritional data.
         
         IMPORTANT: This method ONLY queries the 'dietician_docs' namespace.
@@ -353,18 +1031,19 @@ class RAGService:
             logger.warning(f"[RAG] Cultural Diet query skipped for '{dish_name}' - RAG service not available")
             return []
         
-        logger.info(f"[RAG] Cultural Diet query initiated for dish: '{dish_name}' (top_k={top_k})")
-        logger.info(f"[RAG] NAMESPACE ISOLATION: Querying ONLY '{NAMESPACE_CULTURAL_DIET}' namespace")
-        
-        # Try exact match first, then semantic search
-        query = f"{dish_name} nutritional profile calories carbohydrates Singapore"
+        logger.debug("[RAG] Cultural Diet query for dish '%s' in namespace '%s' (top_k=%s)", dish_name, NAMESPACE_CULTURAL_DIET, top_k)
         
         # STRICT NAMESPACE ISOLATION: Only query dietician_docs namespace
-        results = self.search(query, namespace=NAMESPACE_CULTURAL_DIET, top_k=top_k)
-        logger.info(f"[RAG] Cultural Diet query returned {len(results)} results from namespace '{NAMESPACE_CULTURAL_DIET}' ONLY")
+        results = self.search(
+            dish_name, namespace=NAMESPACE_CULTURAL_DIET, top_k=top_k, query_suffix=_CULTURAL_DIET_QUERY_SUFFIX
+        )
         if results:
-            metadata = results[0].get('metadata', {})
-            logger.debug(f"[RAG] Top result - Dish: {metadata.get('dish_name', 'N/A')}, Source: {metadata.get('source', 'Unknown')}, Carbs: {metadata.get('carbs_g', 'N/A')}g")
+            if logger.isEnabledFor(logging.DEBUG):
+                metadata = results[0].metadata
+                logger.debug(
+                    "[RAG] Top result - Dish: %s, Source: %s, Carbs: %sg",
+                    metadata.get('dish_name', 'N/A'), metadata.get('source', 'Unknown'), metadata.get('carbs_g', 'N/A'),
+                )
         else:
             logger.warning(f"[RAG] No nutritional data found in RAG for dish: '{dish_name}'")
         
@@ -374,53 +1053,43 @@ class RAGService:
         self,
         documents: List[Dict[str, Any]],
         namespace: str,
-        batch_size: int = 96,
-    ) -> None:
+        batch_size: int = UPSERT_BATCH_SIZE,
+    ) -> int:
         """Ingest documents with rich metadata for better retrieval.
         
         Args:
             documents: List of document dicts with keys: content, metadata (source, tags, etc.)
             namespace: Target namespace (clinical_safety, dietician_docs)
-            batch_size: Batch size for upsert (max 96 for text)
+            batch_size: Batch size for upsert (max 96 for text; default UPSERT_BATCH_SIZE env)
+        
+        Returns:
+            Number of records upserted
         """
         if not self.is_available():
             logger.warning("Pinecone not configured. Skipping document ingestion.")
-            return
+            return 0
         
         try:
             # Prepare records
-            records = []
-            for doc in documents:
-                # Use "text" field to match index field_map (text=content)
-                record = {
-                    "_id": doc.get("id", f"{namespace}_{len(records)}"),
+            # Use "text" field to match index field_map (text=content); metadata
+            # is stored in fields (Pinecone integrated embeddings). Built lazily
+            # as batches are submitted.
+            records = (
+                {
+                    "_id": doc.get("id", f"{namespace}_{idx}"),
                     "text": doc["content"].strip(),  # Index expects "text" field
+                    **{key: _to_record_field(value) for key, value in (doc.get("metadata") or {}).items()},
                 }
-                # Add metadata fields
-                metadata = doc.get("metadata", {})
-                if metadata:
-                    # Store metadata in fields (Pinecone integrated embeddings)
-                    for key, value in metadata.items():
-                        if isinstance(value, (str, int, float, bool)):
-                            record[key] = value
-                        elif isinstance(value, list):
-                            record[key] = ", ".join(str(v) for v in value)
-                        else:
-                            record[key] = str(value)
-                
-                records.append(record)
+                for idx, doc in enumerate(documents)
+            )
             
             # Upsert in batches
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
-                self.index.upsert_records(namespace, batch)
-                logger.info(f"Upserted batch {i//batch_size + 1} ({len(batch)} records) to namespace '{namespace}'")
-                time.sleep(0.1)  # Rate limiting
+            upserted_ids = self._upsert_batches(namespace, records, batch_size=batch_size)
             
             # Wait for indexing
-            logger.info(f"Waiting 10 seconds for vectors to be indexed...")
-            time.sleep(10)
-            logger.info(f"Successfully ingested {len(records)} documents into namespace '{namespace}'")
+            self._wait_for_indexing(namespace, upserted_ids)
+            logger.info(f"Successfully ingested {len(upserted_ids)} documents into namespace '{namespace}'")
+            return len(upserted_ids)
             
         except PineconeException as e:
             logger.error(f"Pinecone error during ingestion: {e}", exc_info=True)
@@ -428,16 +1097,30 @@ class RAGService:
         except Exception as e:
             logger.error(f"Unexpected error during ingestion: {e}", exc_info=True)
             raise
+        finally:
+            # Cached results predate the new records (even a failed ingest may
+            # have written some batches); done after indexing so searches in
+            # the meantime can't re-cache stale results.
+            self._invalidate_cache(namespace)
+
+
+_RAG_SERVICE: Optional[RAGService] = None
+_RAG_SERVICE_LOCK = threading.Lock()
 
 
-@lru_cache(maxsize=1)
 def get_rag_service(index_name: Optional[str] = None) -> RAGService:
     """Get singleton RAG service instance.
     
     Args:
-        index_name: Optional index name override
+        index_name: Optional index name override (only used when the singleton
+                    is first created)
         
     Returns:
         RAGService instance
     """
-    return RAGService(index_name=index_name)
+    global _RAG_SERVICE
+    if _RAG_SERVICE is None:
+        with _RAG_SERVICE_LOCK:
+            if _RAG_SERVICE is None:
+                _RAG_SERVICE = RAGService(index_name=index_name)
+    return _RAG_SERVICE
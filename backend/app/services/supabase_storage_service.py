@@ -2,16 +2,22 @@
 
 from __future__ import annotations
 
-import io
+import asyncio
 import logging
-import uuid
-from datetime import datetime
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, Optional
+from urllib.parse import urlparse
 
-from PIL import Image
 from supabase import Client
 
+from app.core.image_resize import resize_image
 from app.core.supabase_client import get_supabase_client
 
 logger = logging.getLogger(__name__)
@@ -19,53 +25,126 @@ logger = logging.getLogger(__name__)
 # Configuration
 STORAGE_BUCKET = "meal-images"
 MAX_IMAGE_SIZE_MB = 10
-MAX_IMAGE_WIDTH = 1024  # Resize images to max 1024px width for efficiency
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".heic", ".webp"}
 
+# Resize worker processes per server worker. Each is a separate interpreter,
+# so keep this small; uploads beyond it queue rather than spawning more.
+RESIZE_POOL_WORKERS = max(1, min(int(os.getenv("RESIZE_POOL_WORKERS", "2")), os.cpu_count() or 1))
+
 
 class ImageUploadError(Exception):
     """Custom exception for image upload errors."""
     pass
 
 
-def _resize_image(image_bytes: bytes, max_width: int = MAX_IMAGE_WIDTH) -> bytes:
-    """Resize image to max width while maintaining aspect ratio.
+def _validate_upload(file_content: bytes, filename: str) -> str:
+    """Validate extension and size of an upload and return its file extension.
 
-    Args:
-        image_bytes: Original image bytes
-        max_width: Maximum width in pixels
+    Raises:
+        ImageUploadError: If the file type or size is not allowed
+    """
+    # Validate file extension
+    file_ext = Path(filename).suffix.lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise ImageUploadError(
+            f"Invalid file extension: {file_ext}. "
+            f"Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
 
-    Returns:
-        Resized image bytes in JPEG format
+    # Validate file size
+    file_size_mb = len(file_content) / (1024 * 1024)
+    if file_size_mb > MAX_IMAGE_SIZE_MB:
+        raise ImageUploadError(
+            f"File too large: {file_size_mb:.2f}MB. Max size: {MAX_IMAGE_SIZE_MB}MB"
+        )
+    return file_ext
+
+
+def _store_image(file_content: bytes, file_ext: str, user_id: str) -> str:
+    """Upload image bytes under a unique per-user path and return the public URL."""
+    # Generate unique filename
+    timestamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+    unique_id = secrets.token_hex(4)
+    storage_path = f"{user_id}/{timestamp}_{unique_id}{file_ext}"
+
+    # Upload to Supabase Storage
+    bucket = _get_bucket()
+
+    logger.info(f"Uploading image to {STORAGE_BUCKET}/{storage_path}")
+
+    # Upload file. storage3 only accepts bytes, files or paths and builds a
+    # multipart body, so the bytes are passed through as-is (no extra copy).
+    bucket.upload(
+        path=storage_path,
+        file=file_content,
+        file_options={"content-type": f"image/{file_ext.replace('.', '')}"}
+    )
+
+    # Get public URL
+    public_url = bucket.get_public_url(storage_path)
+
+    logger.info(f"Image uploaded successfully: {public_url}")
+    return public_url
+
+
+def _get_bucket():
+    """Storage handle for the meal image bucket.
+
+    Built per call (it is a cheap proxy) so it always uses the current
+    client and its auth headers.
     """
+    return get_supabase_client().storage.from_(STORAGE_BUCKET)
+
+
+_resize_pool: Optional[ProcessPoolExecutor] = None
+_resize_pool_lock = threading.Lock()
+
+
+def _get_resize_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound image resizing, created on first use.
+
+    Workers are started with forkserver (spawn where it is unavailable): the
+    server process is multi-threaded, and a forked child can inherit a lock
+    held by another thread and deadlock.
+    """
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _resize_pool = ProcessPoolExecutor(
+                max_workers=RESIZE_POOL_WORKERS, mp_context=multiprocessing.get_context(method)
+            )
+        return _resize_pool
+
+
+def _discard_resize_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next upload starts a fresh one."""
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is pool:
+            _resize_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_resize_pool() -> None:
+    """Stop the resize worker processes, if any were started (app shutdown)."""
+    global _resize_pool
+    with _resize_pool_lock:
+        pool, _resize_pool = _resize_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+async def _resize_image_in_pool(image_bytes: bytes) -> bytes:
+    """Run resize_image() in the process pool, rebuilding the pool if it broke."""
+    pool = _get_resize_pool()
     try:
-        img = Image.open(io.BytesIO(image_bytes))
-
-        # Convert RGBA to RGB if needed (for PNG with transparency)
-        if img.mode in ("RGBA", "LA", "P"):
-            background = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "P":
-                img = img.convert("RGBA")
-            background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-            img = background
-
-        # Resize if width exceeds max_width
-        if img.width > max_width:
-            aspect_ratio = img.height / img.width
-            new_height = int(max_width * aspect_ratio)
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            logger.info(f"Resized image from {img.width}x{img.height} to {max_width}x{new_height}")
-
-        # Convert to JPEG and compress
-        output = io.BytesIO()
-        img.save(output, format="JPEG", quality=85, optimize=True)
-        output.seek(0)
-
-        return output.getvalue()
-    except Exception as exc:
-        logger.error(f"Error resizing image: {exc}", exc_info=True)
-        # Return original bytes if resize fails
-        return image_bytes
+        return await asyncio.get_running_loop().run_in_executor(pool, resize_image, image_bytes)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); without this every later upload would fail to resize.
+        logger.warning("Image resize pool is broken; restarting it and resizing this image in a thread")
+        _discard_resize_pool(pool)
+        return await asyncio.to_thread(resize_image, image_bytes)
 
 
 def upload_meal_image(
@@ -89,51 +168,59 @@ def upload_meal_image(
         ImageUploadError: If upload fails
     """
     try:
-        # Validate file extension
-        file_ext = Path(filename).suffix.lower()
-        if file_ext not in ALLOWED_EXTENSIONS:
-            raise ImageUploadError(
-                f"Invalid file extension: {file_ext}. "
-                f"Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
-            )
-
-        # Validate file size
-        file_size_mb = len(file_content) / (1024 * 1024)
-        if file_size_mb > MAX_IMAGE_SIZE_MB:
-            raise ImageUploadError(
-                f"File too large: {file_size_mb:.2f}MB. Max size: {MAX_IMAGE_SIZE_MB}MB"
-            )
+        file_ext = _validate_upload(file_content, filename)
 
         # Resize image if requested
         if resize:
             try:
-                file_content = _resize_image(file_content)
+                file_content = resize_image(file_content)
                 file_ext = ".jpg"  # Always save as JPEG after resize
             except Exception as exc:
                 logger.warning(f"Image resize failed, uploading original: {exc}")
 
-        # Generate unique filename
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        storage_path = f"{user_id}/{timestamp}_{unique_id}{file_ext}"
+        return _store_image(file_content, file_ext, user_id)
 
-        # Upload to Supabase Storage
-        supabase = get_supabase_client()
+    except ImageUploadError:
+        raise
+    except Exception as exc:
+        logger.error(f"Error uploading image to Supabase Storage: {exc}", exc_info=True)
+        raise ImageUploadError(f"Failed to upload image: {str(exc)}") from exc
 
-        logger.info(f"Uploading image to {STORAGE_BUCKET}/{storage_path}")
 
-        # Upload file
-        result = supabase.storage.from_(STORAGE_BUCKET).upload(
-            path=storage_path,
-            file=file_content,
-            file_options={"content-type": f"image/{file_ext.replace('.', '')}"}
-        )
+async def upload_meal_image_async(
+    file_content: bytes,
+    filename: str,
+    user_id: str,
+    resize: bool = True,
+) -> str:
+    """Async variant of upload_meal_image() that doesn't block the event loop.
 
-        # Get public URL
-        public_url = supabase.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
+    The CPU-bound resize runs in a process pool (so concurrent uploads resize
+    in parallel, outside the GIL) and the blocking Supabase upload in a thread.
 
-        logger.info(f"Image uploaded successfully: {public_url}")
-        return public_url
+    Args:
+        file_content: Image file content as bytes
+        filename: Original filename
+        user_id: User ID for organizing files
+        resize: Whether to resize the image before uploading
+
+    Returns:
+        Public URL of the uploaded image
+
+    Raises:
+        ImageUploadError: If upload fails
+    """
+    try:
+        file_ext = _validate_upload(file_content, filename)
+
+        if resize:
+            try:
+                file_content = await _resize_image_in_pool(file_content)
+                file_ext = ".jpg"  # Always save as JPEG after resize
+            except Exception as exc:
+                logger.warning(f"Image resize failed, uploading original: {exc}")
+
+        return await asyncio.to_thread(_store_image, file_content, file_ext, user_id)
 
     except ImageUploadError:
         raise
@@ -153,28 +240,24 @@ def delete_meal_image(image_url: str, user_id: str) -> bool:
         True if deletion was successful, False otherwise
     """
     try:
-        # Extract storage path from URL
+        # Extract storage path from URL (ignoring any query string, e.g. signed URLs)
         # URL format: https://.../storage/v1/object/public/meal-images/{user_id}/{filename}
-        if STORAGE_BUCKET not in image_url:
+        _, found, storage_path = urlparse(image_url).path.partition(f"/{STORAGE_BUCKET}/")
+        if not found:
             logger.error(f"Invalid image URL: {image_url}")
             return False
 
-        # Extract path after bucket name
-        parts = image_url.split(f"{STORAGE_BUCKET}/")
-        if len(parts) < 2:
+        if not storage_path:
             logger.error(f"Could not extract path from URL: {image_url}")
             return False
 
-        storage_path = parts[1]
-
-        # Verify user_id matches
-        if not storage_path.startswith(user_id):
+        # Verify user_id matches (as a whole path segment, not just a prefix)
+        if not storage_path.startswith(f"{user_id}/"):
             logger.error(f"User ID mismatch for deletion: {user_id} vs {storage_path}")
             return False
 
         # Delete from storage
-        supabase = get_supabase_client()
-        supabase.storage.from_(STORAGE_BUCKET).remove([storage_path])
+        _get_bucket().remove([storage_path])
 
         logger.info(f"Image deleted successfully: {storage_path}")
         return True